@@ -22,18 +22,34 @@
 from os import environ
 
 from source.app import app
-from source.database import db
+from source.database import db, reconcile_user_counters, upgrade_schema
 from source.api import api
+from source.bloom import slug_filter
+from source.concurrency import concurrency_limiter
+from source.hotlinks import hot_links
+from source.jobs import jobs
 from source.jwt import jwt
+from source.queries import query_recorder
+from source.search import url_search
 
 
 # Initializing Factory Instances
 with app.app_context():
     db.init_app(app)
     db.create_all()
+    if upgrade_schema():
+        reconcile_user_counters()
+    url_search.create_index()
     api.init_app(app)
     jwt.init_app(app)
+    query_recorder.init_app(app)
+    jobs.init_app(app)
+    concurrency_limiter.init_app(app)
+    slug_filter.init_app(app)
+    slug_filter.rebuild_if_missing()
+    hot_links.init_app(app)
     import source.resources
+    import source.commands
 
 
 if __name__ == "__main__":
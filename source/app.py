@@ -41,3 +41,12 @@ app.config["JWT_SECRET_KEY"] = token_urlsafe(32)
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=30)
 app.config["JWT_BLACKLIST_ENABLED"] = True
 app.config["PROPAGATE_EXCEPTIONS"] = True
+
+# Concurrency Limits Configs, 4 matches the default threads of waitress
+app.config["SERVER_THREADS"] = int(environ.get("SERVER_THREADS", 4))
+
+# Hot Links Configs
+app.config["HOT_LINKS_SIZE"] = int(environ.get("HOT_LINKS_SIZE", 0))
+
+# Background Jobs Configs
+app.config["JOBS_BACKEND"] = environ.get("JOBS_BACKEND", "inline")
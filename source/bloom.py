@@ -0,0 +1,240 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from hashlib import blake2b
+from math import ceil, log
+from typing import Dict, Iterable, List
+from uuid import uuid4
+
+from flask import Flask
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import select
+
+from source.database import db, URLModel
+from source.metrics import metrics
+from source.redis import cache_redis
+
+
+class SlugFilter:
+    """Bloom filter of existing slugs stored as a Redis bitmap
+
+    A negative answer is definite, so unknown slugs can be rejected without
+    querying the database. The bitmap lives in Redis to be shared by workers.
+    """
+
+    def __init__(self) -> None:
+        self.prefix = "slugs:bloom"
+        self.key = self.prefix
+        self.lock_key = f"{self.prefix}:lock"
+        self.size = 0
+        self.hash_count = 0
+        self.dirty = False
+
+    def init_app(self, app: Flask) -> None:
+        """Sizes the filter from `BLOOM_FILTER_CAPACITY` and `BLOOM_FILTER_ERROR_RATE`
+
+        Args:
+            app (Flask): application holding the configs
+        """
+        capacity = app.config.setdefault("BLOOM_FILTER_CAPACITY", 1_000_000)
+        error_rate = app.config.setdefault("BLOOM_FILTER_ERROR_RATE", 0.01)
+        self.prefix = app.config.setdefault("BLOOM_FILTER_KEY", self.prefix)
+        self.size = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * log(2)))
+        # Sizing is part of the key so a resized filter is never read with
+        # offsets computed for another size
+        self.key = f"{self.prefix}:{self.size}:{self.hash_count}"
+        self.lock_key = f"{self.key}:lock"
+        metrics.register_collector(self.collect_metrics)
+
+    def _offsets(self, slug: str) -> List[int]:
+        digest = blake2b(slug.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def rebuild_if_missing(self) -> None:
+        """Builds the filter unless some process already did"""
+        try:
+            missing = not cache_redis.exists(self.key)
+        except RedisError as err:
+            print(f"Slug Filter Rebuild Failed\nReason: {str(err)}")
+            return
+        if missing:
+            self.rebuild()
+
+    def rebuild(self, batch_size: int = 10000, lock_timeout: int = 600) -> bool:
+        """Rebuilds the filter from all slugs present in the database
+
+        Only one rebuild runs at a time, guarded by a lock whose value names a
+        private building key. Bits are written there and the key then replaces
+        the live one, so lookups never observe a partially built filter. Slugs
+        added while the rebuild runs are written to both keys by `add`.
+
+        Args:
+            batch_size (int, optional): slugs per Redis pipeline. Defaults to 10000.
+            lock_timeout (int, optional): seconds of lock validity, extended
+                after every batch. Defaults to 600.
+
+        Returns:
+            bool: True if rebuilt False if failed, another rebuild is running or
+                the filter was invalidated meanwhile
+        """
+        token = uuid4().hex
+        building_key = f"{self.key}:building:{token}"
+        try:
+            if not cache_redis.set(self.lock_key, token, nx=True, ex=lock_timeout):
+                return False
+            # Allocating the whole bitmap upfront so the filter is never empty
+            cache_redis.setbit(building_key, self.size - 1, 0)
+            cache_redis.expire(building_key, lock_timeout)
+            result = db.session.execute(
+                select(URLModel.slug).execution_options(yield_per=batch_size)
+            )
+            for slugs in result.scalars().partitions():
+                self._set_bits(building_key, slugs)
+                cache_redis.expire(self.lock_key, lock_timeout)
+                cache_redis.expire(building_key, lock_timeout)
+            with cache_redis.pipeline(transaction=True) as pipeline:
+                # A lost lock means `add` stopped writing here or gave up on it
+                pipeline.watch(self.lock_key)
+                if pipeline.get(self.lock_key) != token.encode():
+                    cache_redis.delete(building_key)
+                    return False
+                pipeline.multi()
+                pipeline.persist(building_key)
+                pipeline.rename(building_key, self.key)
+                pipeline.execute()
+            self.dirty = False
+            return True
+        except WatchError:
+            # Lock changed hands while renaming, the building key expires
+            return False
+        except RedisError as err:
+            print(f"Slug Filter Rebuild Failed\nReason: {str(err)}")
+            return False
+        finally:
+            self._release_lock(token)
+
+    def _release_lock(self, token: str) -> None:
+        try:
+            with cache_redis.pipeline(transaction=True) as pipeline:
+                pipeline.watch(self.lock_key)
+                if pipeline.get(self.lock_key) == token.encode():
+                    pipeline.multi()
+                    pipeline.delete(self.lock_key)
+                    pipeline.execute()
+        except (RedisError, WatchError):
+            pass
+
+    def add(self, *slugs: str) -> None:
+        """Adds the `slugs` to the filter, and to the one being rebuilt if any
+
+        Must be called after the slugs are committed, so a concurrent rebuild
+        either reads them from the database or is seen here through its lock.
+        If the bits can not be set the filter is dropped, as it would reject
+        the new slugs, and lookups go to the database until the next rebuild.
+
+        Args:
+            slugs (str): newly stored slugs
+        """
+        if not self.size:
+            return
+        try:
+            token = cache_redis.get(self.lock_key)
+            self._set_bits(self.key, slugs)
+            if token:
+                building_key = f"{self.key}:building:{token.decode()}"
+                self._set_bits(building_key, slugs)
+                # Bits written after the rename would otherwise leave an orphan key
+                cache_redis.expire(building_key, 600)
+        except RedisError as err:
+            print(f"Slug Filter Update Failed\nReason: {str(err)}")
+            self._invalidate()
+
+    def _invalidate(self) -> None:
+        try:
+            token = cache_redis.get(self.lock_key)
+            pipeline = cache_redis.pipeline(transaction=True)
+            pipeline.delete(self.key)
+            if token:
+                # Taking the lock away makes the running rebuild give up too
+                pipeline.delete(self.lock_key)
+                pipeline.delete(f"{self.key}:building:{token.decode()}")
+            pipeline.execute()
+            self.dirty = False
+        except RedisError as err:
+            print(f"Slug Filter Invalidation Failed\nReason: {str(err)}")
+            # Retried by the next lookup, which trusts no filter until then
+            self.dirty = True
+
+    def _set_bits(self, key: str, slugs: Iterable[str]) -> None:
+        pipeline = cache_redis.pipeline(transaction=False)
+        for slug in slugs:
+            for offset in self._offsets(slug):
+                pipeline.setbit(key, offset, 1)
+        pipeline.execute()
+
+    def might_contain(self, slug: str) -> bool:
+        """Checks the `slug` against the filter
+
+        Args:
+            slug (str): slug to be looked up
+
+        Returns:
+            bool: False if `slug` definitely does not exist, True otherwise
+        """
+        if not self.size:
+            return True
+        if self.dirty:
+            self._invalidate()
+            return True
+        try:
+            pipeline = cache_redis.pipeline(transaction=False)
+            pipeline.exists(self.key)
+            for offset in self._offsets(slug):
+                pipeline.getbit(self.key, offset)
+            exists, *bits = pipeline.execute()
+        except RedisError:
+            return True
+        # Missing filter means it was never built so nothing can be rejected
+        if not exists or all(bits):
+            metrics.increment("slug_filter_passed")
+            return True
+        metrics.increment("slug_filter_rejected")
+        return False
+
+    def collect_metrics(self) -> Dict[str, float]:
+        """Estimates the false positive rate from the fraction of set bits
+
+        Returns:
+            Dict[str, float]: false positive rate and memory footprint in bytes
+        """
+        bits_set = cache_redis.bitcount(self.key)
+        fill_ratio = bits_set / self.size
+        return {
+            "slug_filter_false_positive_rate": fill_ratio**self.hash_count,
+            "slug_filter_memory_bytes": cache_redis.strlen(self.key),
+            "slug_filter_bits_set": bits_set,
+        }
+
+
+slug_filter = SlugFilter()
@@ -0,0 +1,213 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from csv import writer
+from datetime import datetime
+from io import StringIO
+from random import Random
+from typing import Iterator, List
+
+import click
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+
+from source.app import app
+from source.bloom import slug_filter
+from source.database import db, reconcile_user_counters, UserModel, URLModel
+from source.jobs import jobs
+
+
+BASE_62_STR = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+TARGET_DOMAINS = (
+    "www.google.com",
+    "www.youtube.com",
+    "github.com",
+    "www.wikipedia.org",
+    "www.reddit.com",
+    "news.ycombinator.com",
+    "www.amazon.com",
+    "medium.com",
+    "stackoverflow.com",
+    "docs.python.org",
+)
+TARGET_WORDS = (
+    "docs",
+    "blog",
+    "release",
+    "campaign",
+    "product",
+    "guide",
+    "search",
+    "video",
+    "profile",
+    "pricing",
+)
+
+
+def _base_62(number: int, width: int) -> str:
+    """Encodes the `number` in base 62 padded to fixed `width`
+
+    Args:
+        number (int): non-negative number to be encoded
+        width (int): length of the resultant string
+
+    Returns:
+        str: base 62 representation of the `number`
+    """
+    encoded = ""
+    for _ in range(width):
+        encoded = BASE_62_STR[number % 62] + encoded
+        number //= 62
+    return encoded
+
+
+def _batches(total: int, size: int) -> Iterator[range]:
+    for start in range(0, total, size):
+        yield range(start, min(start + size, total))
+
+
+def _bulk_insert(table, rows: List[dict]) -> None:
+    """Writes `rows` into `table` with a single bulk statement
+
+    Uses `COPY ... FROM STDIN` on PostgreSQL and Core `executemany` otherwise.
+
+    Args:
+        table (Table): SQLAlchemy table to write into
+        rows (List[dict]): rows having same keys as table columns
+    """
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        columns = list(rows[0].keys())
+        buffer = StringIO()
+        csv = writer(buffer)
+        for row in rows:
+            csv.writerow(row[column] for column in columns)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        cursor.close()
+    else:
+        connection.execute(table.insert(), rows)
+
+
+@app.cli.command("seed")
+@click.option("--users", default=1000, show_default=True, type=click.IntRange(1))
+@click.option("--urls", default=10000, show_default=True, type=click.IntRange(0))
+@click.option(
+    "--seed",
+    default=0,
+    show_default=True,
+    type=click.IntRange(0, 62**3 - 1),
+    help="Seed for random generator, use different seeds for repeated runs.",
+)
+@click.option("--batch-size", default=10000, show_default=True, type=click.IntRange(1))
+@click.option("--password", default="password123", show_default=True)
+def seed_command(users: int, urls: int, seed: int, batch_size: int, password: str):
+    """Bulk inserts generated users and URLs for profiling"""
+    rng = Random(seed)
+    # Hashing once as PBKDF2 per user would dominate the run time
+    password_hash = generate_password_hash(password)
+    created = datetime.utcnow()
+    username_prefix = f"seed{seed}n"
+
+    for batch in _batches(users, batch_size):
+        _bulk_insert(
+            UserModel.__table__,
+            [
+                dict(
+                    first_name="Seed",
+                    last_name=f"User{index}"[:20],
+                    email=f"{username_prefix}{index}@example.com",
+                    username=f"{username_prefix}{index}",
+                    password=password_hash,
+                    verified=True,
+                    active=True,
+                    created=created,
+                )
+                for index in batch
+            ],
+        )
+        db.session.commit()
+        click.echo(f"users: {batch.stop}/{users}")
+
+    user_ids = (
+        db.session.execute(
+            select(UserModel.id)
+            .where(UserModel.username.like(f"{username_prefix}%"))
+            .order_by(UserModel.id)
+        )
+        .scalars()
+        .all()
+    )
+
+    slug_prefix = _base_62(seed, 3)
+    for batch in _batches(urls, batch_size):
+        rows = []
+        for index in batch:
+            # Cubing skews ownership towards few heavy accounts
+            owner = user_ids[int(len(user_ids) * rng.random() ** 3)]
+            # Pareto with alpha 1.16 gives 80/20 split of visits across URLs
+            visit_count = min(int(rng.paretovariate(1.16)) - 1, 10**8)
+            rows.append(
+                dict(
+                    slug=slug_prefix + _base_62(index, 6),
+                    target=(
+                        f"https://{rng.choice(TARGET_DOMAINS)}/"
+                        f"{rng.choice(TARGET_WORDS)}/{rng.choice(TARGET_WORDS)}"
+                        f"?ref={index}"
+                    ),
+                    active=rng.random() < 0.95,
+                    visit_count=visit_count,
+                    user_id=owner,
+                )
+            )
+        _bulk_insert(URLModel.__table__, rows)
+        db.session.commit()
+        slug_filter.add(*(row["slug"] for row in rows))
+        click.echo(f"urls: {batch.stop}/{urls}")
+
+    click.echo(f"reconciled users: {reconcile_user_counters()}")
+
+
+@app.cli.command("reconcile-counters")
+def reconcile_counters_command():
+    """Fixes drift in url_count, active_url_count and total_visits of users"""
+    click.echo(f"reconciled users: {reconcile_user_counters()}")
+
+
+@app.cli.command("worker")
+@click.option("--concurrency", default=4, show_default=True, type=click.IntRange(1))
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+def worker_command(concurrency: int, burst: bool):
+    """Runs enqueued background jobs"""
+    jobs.work(concurrency=concurrency, burst=burst)
+
+
+@app.cli.command("rebuild-slug-filter")
+def rebuild_slug_filter_command():
+    """Rebuilds the bloom filter of slugs from the database"""
+    rebuilt = slug_filter.rebuild()
+    click.echo("rebuilt" if rebuilt else "another rebuild is running or it failed")
@@ -0,0 +1,238 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from threading import Condition
+from time import monotonic
+from typing import Callable, Dict, Union
+
+from flask import Flask, current_app, g, request
+
+from source.metrics import metrics
+
+
+def default_limits(threads: int) -> Dict[str, dict]:
+    """Sizes the limits of each class to the `threads` serving requests
+
+    A request waiting for a slot holds a server thread too, so expensive
+    requests, running or queued, always leave at least one thread free for
+    redirects.
+
+    Args:
+        threads (int): number of threads of the WSGI server
+
+    Returns:
+        Dict[str, dict]: limiter options by class name
+    """
+    expensive = max(1, threads // 2)
+    return {
+        "redirect": dict(
+            initial=threads,
+            minimum=max(1, threads // 4),
+            maximum=threads,
+            queue_size=threads,
+        ),
+        "expensive": dict(
+            initial=expensive,
+            minimum=1,
+            maximum=expensive,
+            queue_size=max(0, threads - 1 - expensive),
+        ),
+    }
+
+
+def concurrency_class(name: str) -> Callable:
+    """Assigns the resource method to the concurrency class `name`
+
+    Args:
+        name (str): key of `CONCURRENCY_LIMITS` config
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.concurrency_class = name
+        return func
+
+    return decorator
+
+
+class Limiter:
+    """Adaptive limit of requests of a class being served at the same time
+
+    Every endpoint keeps its own baseline, the long term average of its
+    latency, so neither a class mixing fast and slow endpoints nor an endpoint
+    with fast early exits is mistaken for an overloaded one. Once per window
+    of `limit`, and at least 20, requests the limit shrinks by 10% if their
+    latency averaged over `tolerance` times their baselines, i.e. latency
+    just went up as requests are queueing somewhere, and grows by one
+    otherwise.
+    Requests over the limit wait up to `queue_timeout` seconds in a queue of
+    `queue_size`, the rest are shed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        queue_size: int,
+        queue_timeout: float = 0.5,
+        tolerance: float = 2.0,
+    ) -> None:
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.waiting = 0
+        self.baselines = {}
+        self.window_size = 0
+        self.window_ratio = 0.0
+        self.condition = Condition()
+
+    def acquire(self) -> bool:
+        """Waits for a free slot
+
+        Returns:
+            bool: True if admitted False if the request has to be shed
+        """
+        with self.condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            if self.waiting >= self.queue_size:
+                return False
+            metrics.increment(f"concurrency_queued:{self.name}")
+            self.waiting += 1
+            deadline = monotonic() + self.queue_timeout
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+                self.in_flight += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self, latency: float, endpoint: Union[str, None] = None) -> None:
+        """Frees the slot and adjusts the limit with observed `latency`
+
+        Args:
+            latency (float): seconds taken to serve the request
+            endpoint (str, optional): endpoint whose baseline `latency` is
+                compared to. Defaults to None.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            baseline, samples = self.baselines.get(endpoint, (latency, 0))
+            samples = min(samples + 1, 1000)
+            # A plain mean of the first samples, then a slow moving average so
+            # the baseline follows long term changes but not a sudden slowdown
+            baseline += (latency - baseline) / samples
+            self.baselines[endpoint] = (baseline, samples)
+            self.window_ratio += latency / baseline if baseline > 0 else 1.0
+            self.window_size += 1
+            # Small limits still average enough samples to ignore noise
+            if self.window_size >= max(int(self.limit), 20):
+                if self.window_ratio / self.window_size > self.tolerance:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1)
+                self.window_size = 0
+                self.window_ratio = 0.0
+            self.condition.notify()
+
+
+class ConcurrencyLimiter:
+    """Sheds requests of a class when its adaptive concurrency limit is hit
+
+    Methods are assigned to a class with `concurrency_class`, so slow logins or
+    listings can not take all worker threads away from redirects. Limits are
+    configured by `CONCURRENCY_LIMITS`, unassigned methods are not limited.
+    """
+
+    def __init__(self) -> None:
+        self.limiters = {}
+
+    def init_app(self, app: Flask) -> None:
+        """Creates limiters from `CONCURRENCY_LIMITS`, sized to `SERVER_THREADS`
+        unless configured, and hooks into `app`
+
+        Args:
+            app (Flask): application whose requests are to be limited
+        """
+        threads = app.config.setdefault("SERVER_THREADS", 4)
+        limits = app.config.setdefault("CONCURRENCY_LIMITS", default_limits(threads))
+        self.limiters = {
+            name: Limiter(name, **options) for name, options in limits.items()
+        }
+        app.before_request(self._acquire)
+        app.teardown_request(self._release)
+        metrics.register_collector(self.collect_metrics)
+
+    def _acquire(self):
+        limiter = self._get_limiter()
+        if limiter is None:
+            return None
+        if not limiter.acquire():
+            metrics.increment(f"concurrency_shed:{limiter.name}")
+            return (
+                dict(message="Server is busy, please retry"),
+                503,
+                {"Retry-After": "1"},
+            )
+        metrics.increment(f"concurrency_admitted:{limiter.name}")
+        g.concurrency_slot = (limiter, request.endpoint, monotonic())
+        return None
+
+    def _release(self, _exception) -> None:
+        slot = g.pop("concurrency_slot", None)
+        if slot:
+            limiter, endpoint, started = slot
+            limiter.release(monotonic() - started, endpoint)
+
+    def _get_limiter(self) -> Union[Limiter, None]:
+        if request.endpoint is None:
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        view_class = getattr(view, "view_class", None)
+        method = getattr(view_class, request.method.lower(), None)
+        return self.limiters.get(getattr(method, "concurrency_class", None))
+
+    def collect_metrics(self) -> Dict[str, float]:
+        """Reports current limit, in flight and waiting requests of each class
+
+        Returns:
+            Dict[str, float]: gauges suffixed with class name
+        """
+        values = {}
+        for name, limiter in self.limiters.items():
+            values[f"concurrency_limit:{name}"] = int(limiter.limit)
+            values[f"concurrency_in_flight:{name}"] = limiter.in_flight
+            values[f"concurrency_waiting:{name}"] = limiter.waiting
+        return values
+
+
+concurrency_limiter = ConcurrencyLimiter()
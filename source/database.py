@@ -20,6 +20,7 @@
  """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, inspect, select, text, update
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
@@ -54,6 +55,34 @@ class ModelMixin:
         db.session.delete(self)
         return self.__commit()
 
+    @classmethod
+    def update_where(cls, *criteria, **values) -> int:
+        """updates all rows matching `criteria` with a single statement
+
+        Note: the change is staged and gets committed along with the next commit
+
+        Returns:
+            int: number of updated rows
+        """
+        return cls.query.filter(*criteria).update(values, synchronize_session=False)
+
+    @classmethod
+    def increment_where(cls, *criteria, **deltas) -> int:
+        """adds `deltas` to the columns of all rows matching `criteria`
+
+        Note: the change is staged and gets committed along with the next commit
+
+        Returns:
+            int: number of matched rows
+        """
+        return cls.query.filter(*criteria).update(
+            {
+                getattr(cls, name): getattr(cls, name) + delta
+                for name, delta in deltas.items()
+            },
+            synchronize_session=False,
+        )
+
     def __commit(self) -> bool:
         try:
             db.session.commit()
@@ -76,6 +105,9 @@ class UserModel(db.Model, ModelMixin):
     verified = db.Column(db.Boolean(), default=False)
     active = db.Column(db.Boolean(), default=False)
     created = db.Column(db.DateTime(), default=datetime.utcnow())
+    url_count = db.Column(db.Integer(), default=0)
+    active_url_count = db.Column(db.Integer(), default=0)
+    total_visits = db.Column(db.Integer(), default=0)
 
     urls = db.relationship(
         "URLModel", back_populates="user", cascade="all, delete-orphan", lazy="dynamic"
@@ -90,6 +122,78 @@ class URLModel(db.Model, ModelMixin):
     target = db.Column(db.Text(), nullable=False)
     active = db.Column(db.Boolean(), default=True)
     visit_count = db.Column(db.Integer(), default=0)
-    user_id = db.Column(db.Integer(), db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer(), db.ForeignKey("users.id"), nullable=False, index=True
+    )
 
     user = db.relationship("UserModel", back_populates="urls")
+
+
+def upgrade_schema() -> bool:
+    """Adds the columns and indexes introduced after the tables were created
+
+    `db.create_all` only creates missing tables, so databases created by
+    earlier versions are brought up to date here.
+
+    Returns:
+        bool: True if counter columns were added and need reconciliation
+    """
+    inspector = inspect(db.engine)
+    columns = {column["name"] for column in inspector.get_columns("users")}
+    added = False
+    for column in ("url_count", "active_url_count", "total_visits"):
+        if column in columns:
+            continue
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    text(f"ALTER TABLE users ADD COLUMN {column} INTEGER DEFAULT 0")
+                )
+            added = True
+        except SQLAlchemyError as err:
+            # Another process may have added it in the meantime
+            print(f"Schema Upgrade Failed\nReason: {str(err)}")
+    for table in (UserModel.__table__, URLModel.__table__):
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                try:
+                    index.create(db.engine)
+                except SQLAlchemyError as err:
+                    print(f"Schema Upgrade Failed\nReason: {str(err)}")
+    return added
+
+
+def reconcile_user_counters() -> int:
+    """Recomputes the denormalized counters of all users from `urls`
+
+    Returns:
+        int: number of users whose counters were changed
+    """
+    urls = URLModel.__table__
+    owned = urls.c.user_id == UserModel.id
+    url_count = select(func.count()).where(owned).scalar_subquery()
+    active_url_count = (
+        select(func.count()).where(owned, urls.c.active.is_(True)).scalar_subquery()
+    )
+    total_visits = (
+        select(func.coalesce(func.sum(urls.c.visit_count), 0))
+        .where(owned)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(UserModel)
+        .where(
+            UserModel.url_count.is_distinct_from(url_count)
+            | UserModel.active_url_count.is_distinct_from(active_url_count)
+            | UserModel.total_visits.is_distinct_from(total_visits)
+        )
+        .values(
+            url_count=url_count,
+            active_url_count=active_url_count,
+            total_visits=total_visits,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
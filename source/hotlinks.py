@@ -0,0 +1,164 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from collections import namedtuple
+from types import MappingProxyType
+from typing import Tuple, Union
+
+from flask import Flask
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from source.database import db, URLModel
+from source.metrics import metrics
+from source.redis import cache_redis
+
+
+HotLink = namedtuple("HotLink", ["id", "slug", "target", "user_id"])
+
+
+class HotLinks:
+    """Read-only in-process table of the most visited slugs
+
+    Loaded once at startup so redirects of popular links are answered from
+    memory from the first request. Loading before workers are forked (e.g.
+    gunicorn --preload) shares the table between them copy-on-write.
+
+    Links renamed or deactivated after warm up are tracked in a Redis set of
+    `slug:id` entries written by every path changing them, and are served
+    from the database instead while they are in it. Only links warmed up by
+    some process, recorded in another Redis set, are ever tracked.
+    """
+
+    def __init__(self) -> None:
+        self.links = MappingProxyType({})
+        self.enabled = False
+        self.stale_key = "hot_links:stale"
+        self.members_key = "hot_links:members"
+
+    def init_app(self, app: Flask) -> None:
+        """Warms up the table with top `HOT_LINKS_SIZE` slugs, 0 disables it
+
+        Args:
+            app (Flask): application holding the configs
+        """
+        size = app.config.setdefault("HOT_LINKS_SIZE", 0)
+        self.enabled = size > 0
+        if self.enabled:
+            self.load(size)
+        metrics.register_collector(lambda: {"hot_links_size": len(self.links)})
+
+    def load(self, size: int) -> None:
+        """Loads `size` active slugs having highest visit count
+
+        Args:
+            size (int): max number of slugs to be kept in memory
+        """
+        links = {
+            row.slug: HotLink(*row)
+            for row in db.session.execute(
+                select(URLModel.id, URLModel.slug, URLModel.target, URLModel.user_id)
+                .where(URLModel.active.is_(True))
+                .order_by(URLModel.visit_count.desc())
+                .limit(size)
+            )
+        }
+        if links:
+            try:
+                cache_redis.sadd(
+                    self.members_key,
+                    *[f"{link.slug}:{link.id}" for link in links.values()],
+                )
+            except RedisError as err:
+                print(f"Hot Links Warm Up Failed\nReason: {str(err)}")
+                return
+            # Changes committed before the links were registered were not
+            # tracked, so keeping only the links still unchanged since then
+            current = set(
+                db.session.execute(
+                    select(URLModel.id, URLModel.slug).where(
+                        URLModel.id.in_([link.id for link in links.values()]),
+                        URLModel.active.is_(True),
+                    )
+                ).all()
+            )
+            links = {
+                slug: link
+                for slug, link in links.items()
+                if (link.id, link.slug) in current
+            }
+        self.links = MappingProxyType(links)
+
+    def lookup(self, slug: str) -> Union[HotLink, None]:
+        """Finds the `slug` in the table unless it went stale since warm up
+
+        Args:
+            slug (str): slug being visited
+
+        Returns:
+            Union[HotLink, None]: HotLink if it can be served None otherwise
+        """
+        link = self.links.get(slug)
+        if link is None:
+            return None
+        try:
+            stale = cache_redis.sismember(self.stale_key, f"{slug}:{link.id}")
+        except RedisError:
+            return None
+        if stale:
+            metrics.increment("hot_links_stale")
+            return None
+        metrics.increment("hot_links_hits")
+        return link
+
+    def invalidate(self, *links: Tuple[int, str]) -> None:
+        """Stops serving the `links` from the table
+
+        Args:
+            links (Tuple[int, str]): id and slug of renamed or deactivated URLs
+        """
+        members = [f"{slug}:{url_id}" for url_id, slug in links]
+        if not self.enabled or not members:
+            return
+        try:
+            warmed = cache_redis.smismember(self.members_key, members)
+            stale = [member for member, hot in zip(members, warmed) if hot]
+            if stale:
+                cache_redis.sadd(self.stale_key, *stale)
+        except RedisError as err:
+            print(f"Hot Links Update Failed\nReason: {str(err)}")
+
+    def revalidate(self, *links: Tuple[int, str]) -> None:
+        """Serves the `links` from the table again
+
+        Args:
+            links (Tuple[int, str]): id and slug of reactivated URLs
+        """
+        members = [f"{slug}:{url_id}" for url_id, slug in links]
+        if not self.enabled or not members:
+            return
+        try:
+            cache_redis.srem(self.stale_key, *members)
+        except RedisError as err:
+            print(f"Hot Links Update Failed\nReason: {str(err)}")
+
+
+hot_links = HotLinks()
@@ -0,0 +1,413 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from heapq import heappop, heappush
+from json import dumps, loads
+from queue import Empty, Queue
+from signal import SIGTERM, getsignal, signal
+from threading import Event, Lock, Thread, current_thread, main_thread
+from time import time
+from typing import Callable, Dict, Union
+from uuid import uuid4
+
+from flask import Flask
+from redis.exceptions import RedisError, WatchError
+
+from source.metrics import metrics
+from source.redis import cache_redis
+
+
+class MemoryBackend:
+    """In-process queue meant for tests and single process setups
+
+    Jobs die with the process, so there is nothing to acknowledge or recover.
+    """
+
+    def __init__(self) -> None:
+        self.queue = Queue()
+        self.delayed = []
+        self.dead = []
+        self.lock = Lock()
+        self.counters = {}
+
+    def push(self, payload: str) -> None:
+        self.queue.put(payload)
+
+    def pop(self, timeout: float) -> Union[str, None]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def ack(self, payload: str) -> None:
+        pass
+
+    def requeue(self, payload: str) -> None:
+        self.queue.put(payload)
+
+    def schedule(self, payload: str, due: float) -> None:
+        with self.lock:
+            heappush(self.delayed, (due, payload))
+
+    def promote(self) -> int:
+        promoted = 0
+        with self.lock:
+            while self.delayed and self.delayed[0][0] <= time():
+                self.queue.put(heappop(self.delayed)[1])
+                promoted += 1
+        return promoted
+
+    def pending(self) -> int:
+        with self.lock:
+            return self.queue.qsize() + len(self.delayed)
+
+    def heartbeat(self, ttl: int) -> None:
+        pass
+
+    def recover(self) -> int:
+        return 0
+
+    def retire(self) -> None:
+        pass
+
+    def bury(self, payload: str) -> None:
+        with self.lock:
+            self.dead.append(payload)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            counters = dict(self.counters)
+            delayed_depth = len(self.delayed)
+        return dict(
+            counters,
+            queue_depth=self.queue.qsize(),
+            delayed_depth=delayed_depth,
+            dead_depth=len(self.dead),
+        )
+
+
+class RedisBackend:
+    """Queue stored as Redis lists shared by API processes and workers
+
+    A popped job is atomically moved to the processing list of its worker and
+    only removed from there once it has succeeded, been rescheduled or been
+    buried. Each worker keeps a heartbeat key alive, and a starting worker
+    moves the processing lists of workers without one back to the queue, so a
+    crashed worker never loses a job. Retries wait in a sorted set scored by
+    the time they are due.
+
+    Counters live in a Redis hash, so latency recorded by workers is visible
+    in the metrics of every API process.
+    """
+
+    def __init__(self, prefix: str = "jobs") -> None:
+        self.queue_key = f"{prefix}:queue"
+        self.delayed_key = f"{prefix}:delayed"
+        self.dead_key = f"{prefix}:dead"
+        self.stats_key = f"{prefix}:stats"
+        self.processing_prefix = f"{prefix}:processing:"
+        self.heartbeat_prefix = f"{prefix}:heartbeat:"
+        self.worker_id = uuid4().hex
+
+    @property
+    def processing_key(self) -> str:
+        return f"{self.processing_prefix}{self.worker_id}"
+
+    def push(self, payload: str) -> None:
+        cache_redis.rpush(self.queue_key, payload)
+
+    def pop(self, timeout: float) -> Union[str, None]:
+        return cache_redis.blmove(
+            self.queue_key, self.processing_key, timeout, "LEFT", "RIGHT"
+        )
+
+    def ack(self, payload: str) -> None:
+        cache_redis.lrem(self.processing_key, 1, payload)
+
+    def requeue(self, payload: str) -> None:
+        pipeline = cache_redis.pipeline(transaction=True)
+        pipeline.lrem(self.processing_key, 1, payload)
+        pipeline.lpush(self.queue_key, payload)
+        pipeline.execute()
+
+    def schedule(self, payload: str, due: float) -> None:
+        cache_redis.zadd(self.delayed_key, {payload: due})
+
+    def promote(self) -> int:
+        with cache_redis.pipeline() as pipeline:
+            try:
+                pipeline.watch(self.delayed_key)
+                due = pipeline.zrangebyscore(
+                    self.delayed_key, "-inf", time(), start=0, num=100
+                )
+                if not due:
+                    return 0
+                pipeline.multi()
+                pipeline.zrem(self.delayed_key, *due)
+                pipeline.rpush(self.queue_key, *due)
+                pipeline.execute()
+                return len(due)
+            except WatchError:
+                # another worker promoted them first
+                return 0
+
+    def pending(self) -> int:
+        # a single transaction, so a job being promoted is counted once
+        pipeline = cache_redis.pipeline()
+        pipeline.llen(self.queue_key)
+        pipeline.zcard(self.delayed_key)
+        return sum(pipeline.execute())
+
+    def heartbeat(self, ttl: int) -> None:
+        cache_redis.set(f"{self.heartbeat_prefix}{self.worker_id}", 1, ex=ttl)
+
+    def recover(self) -> int:
+        recovered = 0
+        for key in cache_redis.scan_iter(match=f"{self.processing_prefix}*"):
+            worker_id = key.decode()[len(self.processing_prefix) :]
+            if cache_redis.exists(f"{self.heartbeat_prefix}{worker_id}"):
+                continue
+            while cache_redis.lmove(key, self.queue_key, "RIGHT", "LEFT"):
+                recovered += 1
+        return recovered
+
+    def retire(self) -> None:
+        cache_redis.delete(f"{self.heartbeat_prefix}{self.worker_id}")
+
+    def bury(self, payload: str) -> None:
+        cache_redis.rpush(self.dead_key, payload)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        cache_redis.hincrby(self.stats_key, name, value)
+
+    def stats(self) -> Dict[str, float]:
+        pipeline = cache_redis.pipeline(transaction=False)
+        pipeline.hgetall(self.stats_key)
+        pipeline.llen(self.queue_key)
+        pipeline.zcard(self.delayed_key)
+        pipeline.llen(self.dead_key)
+        counters, queue_depth, delayed_depth, dead_depth = pipeline.execute()
+        return dict(
+            {name.decode(): int(value) for name, value in counters.items()},
+            queue_depth=queue_depth,
+            delayed_depth=delayed_depth,
+            dead_depth=dead_depth,
+        )
+
+
+class JobQueue:
+    """Runs registered tasks off the request path
+
+    `JOBS_BACKEND` selects where enqueued jobs go: `inline` runs them right
+    away in the caller, `memory` keeps them in an in-process queue and
+    `redis` shares them with `flask worker` processes. Failed jobs are retried
+    `JOBS_MAX_RETRIES` times, the n-th retry waiting `JOBS_RETRY_BACKOFF`
+    seconds times 2 ** (n - 1), and then moved to the dead-letter list. Workers
+    move due retries back to the queue about once a second. Jobs run at least
+    once: one whose outcome can not be stored in Redis is queued again.
+    """
+
+    def __init__(self) -> None:
+        self.app = None
+        self.backend = None
+        self.max_retries = 3
+        self.retry_backoff = 1.0
+        self.heartbeat_ttl = 30
+        self.tasks = {}
+
+    def init_app(self, app: Flask) -> None:
+        """Configures the backend from `JOBS_BACKEND`, `JOBS_MAX_RETRIES` and
+        `JOBS_RETRY_BACKOFF`
+
+        Args:
+            app (Flask): application whose context jobs are run in
+        """
+        self.app = app
+        self.max_retries = app.config.setdefault("JOBS_MAX_RETRIES", 3)
+        self.retry_backoff = app.config.setdefault("JOBS_RETRY_BACKOFF", 1.0)
+        backend = app.config.setdefault("JOBS_BACKEND", "inline")
+        if backend == "redis":
+            self.backend = RedisBackend()
+        elif backend == "memory":
+            self.backend = MemoryBackend()
+        elif backend != "inline":
+            raise ValueError(f"Unknown JOBS_BACKEND {backend}")
+        if self.backend:
+            metrics.register_collector(self.collect_metrics)
+
+    def task(self, func: Callable) -> Callable:
+        """Registers the `func` so it can be enqueued by its name"""
+        self.tasks[func.__name__] = func
+        return func
+
+    def enqueue(self, task: Callable, **kwargs) -> bool:
+        """Schedules the registered `task` to be called with `kwargs`
+
+        Args:
+            task (Callable): function registered with `task` decorator
+            kwargs: JSON serializable arguments of the task
+
+        Returns:
+            bool: True if enqueued, or succeeded when run inline, False otherwise
+        """
+        if self.backend is None:
+            try:
+                task(**kwargs)
+                return True
+            except Exception as err:
+                print(f"Job {task.__name__} Failed\nReason: {str(err)}")
+                return False
+        job = dict(
+            id=uuid4().hex, name=task.__name__, kwargs=kwargs, attempts=0, at=time()
+        )
+        try:
+            self.backend.push(dumps(job))
+        except RedisError as err:
+            print(f"Job {task.__name__} Enqueue Failed\nReason: {str(err)}")
+            return False
+        self._increment("enqueued")
+        return True
+
+    def work(self, concurrency: int = 1, burst: bool = False) -> None:
+        """Processes jobs with `concurrency` threads until interrupted
+
+        Jobs left behind by crashed workers are re-queued first. On SIGTERM or
+        Ctrl+C the threads finish the job they are running and then exit.
+
+        Args:
+            concurrency (int, optional): number of jobs run at once. Defaults to 1.
+            burst (bool, optional): stop once no job is queued or waiting for a
+                retry. Defaults to False.
+        """
+        if self.backend is None:
+            raise RuntimeError("JOBS_BACKEND inline runs jobs without a worker")
+        self.backend.heartbeat(self.heartbeat_ttl)
+        recovered = self.backend.recover()
+        if recovered:
+            print(f"Re-queued {recovered} jobs of stopped workers")
+        stop = Event()
+        previous_handler = None
+        if current_thread() is main_thread():
+            previous_handler = getsignal(SIGTERM)
+            signal(SIGTERM, lambda signum, frame: stop.set())
+        threads = [
+            Thread(target=self._work, args=(stop, burst), daemon=True)
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    self.backend.heartbeat(self.heartbeat_ttl)
+                    self.backend.promote()
+                except RedisError as err:
+                    print(f"Job Queue Unavailable\nReason: {str(err)}")
+                stop.wait(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+        finally:
+            for thread in threads:
+                thread.join()
+            if previous_handler is not None:
+                signal(SIGTERM, previous_handler)
+            self.backend.retire()
+
+    def _work(self, stop: Event, burst: bool) -> None:
+        while not stop.is_set():
+            try:
+                payload = self.backend.pop(timeout=1)
+                if payload is None:
+                    if burst and not self.backend.pending():
+                        return
+                    continue
+            except RedisError as err:
+                print(f"Job Queue Unavailable\nReason: {str(err)}")
+                stop.wait(timeout=1)
+                continue
+            self._finish(stop, payload)
+
+    def _finish(self, stop: Event, payload: str) -> None:
+        try:
+            self._run(payload)
+            self.backend.ack(payload)
+            return
+        except RedisError as err:
+            print(f"Job Queue Unavailable\nReason: {str(err)}")
+        # The job could not be settled, so it is put back in the queue and may
+        # run again. Until that succeeds it stays in the processing list,
+        # where `recover` finds it if this worker stops meanwhile.
+        while not stop.wait(timeout=1):
+            try:
+                self.backend.requeue(payload)
+                return
+            except RedisError as err:
+                print(f"Job Requeue Failed\nReason: {str(err)}")
+
+    def _run(self, payload: str) -> None:
+        try:
+            job = loads(payload)
+        except ValueError:
+            print(f"Job Discarded\nReason: {payload!r} is not a job")
+            self.backend.bury(payload)
+            self._increment("dead")
+            return
+        started = time()
+        self._increment("latency_ms_total", int((started - job["at"]) * 1000))
+        try:
+            with self.app.app_context():
+                self.tasks[job["name"]](**job["kwargs"])
+        except Exception as err:
+            print(f"Job {job['name']} Failed\nReason: {str(err)}")
+            job["attempts"] += 1
+            job["error"] = str(err)
+            if job["attempts"] > self.max_retries:
+                self.backend.bury(dumps(job))
+                self._increment("dead")
+            else:
+                job["at"] = time() + self.retry_backoff * 2 ** (job["attempts"] - 1)
+                self.backend.schedule(dumps(job), job["at"])
+                self._increment("retried")
+            return
+        self._increment("succeeded")
+        self._increment("duration_ms_total", int((time() - started) * 1000))
+
+    def _increment(self, name: str, value: int = 1) -> None:
+        # Counters are only bookkeeping, losing one must not fail the job
+        try:
+            self.backend.increment(name, value)
+        except RedisError as err:
+            print(f"Job Counter Update Failed\nReason: {str(err)}")
+
+    def collect_metrics(self) -> Dict[str, float]:
+        """Reports queue depths and job counters
+
+        Returns:
+            Dict[str, float]: counters prefixed with `jobs_`
+        """
+        return {f"jobs_{name}": value for name, value in self.backend.stats().items()}
+
+
+jobs = JobQueue()
@@ -19,9 +19,10 @@
  CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
  """
 
-from datetime import timedelta
+from time import time
 from typing import Union
 
+from flask import current_app
 from flask_jwt_extended import JWTManager
 
 from source.redis import jwt_redis_blocklist
@@ -44,15 +45,46 @@ def user_lookup_callback(_header, payload) -> Union[UserModel, None]:
 
 @jwt.token_in_blocklist_loader
 def token_lookup_callback(_header, payload) -> bool:
-    jti = payload["jti"]
-    token_in_redis = jwt_redis_blocklist.get(jti)
-    return token_in_redis is not None
+    pipeline = jwt_redis_blocklist.pipeline(transaction=False)
+    pipeline.exists(payload["jti"])
+    pipeline.get(f"revoked_before:{payload['sub']}")
+    token_in_redis, revoked_before = pipeline.execute()
+    return bool(token_in_redis) or (
+        revoked_before is not None and payload["iat"] < int(revoked_before)
+    )
 
 
-def blocklist_token(jti: str) -> None:
-    """Stores the `jti` in Redis block-listed database
+def blocklist_token(jti: str, expires: int) -> None:
+    """Stores the `jti` in Redis block-listed database until the token expires
 
     Args:
-        jti (_type_): jti of the JWT token
+        jti (str): jti of the JWT token
+        expires (int): exp of the JWT token as unix timestamp
     """
-    jwt_redis_blocklist.set(name=jti, value="", ex=timedelta(minutes=30))
+    ttl = expires - int(time())
+    if ttl > 0:
+        jwt_redis_blocklist.set(name=jti, value="", ex=ttl)
+
+
+def revoke_user_tokens(user_id: int, jti: str, expires: int) -> None:
+    """Invalidates all the tokens issued to the user so far with a single key
+
+    Tokens issued before the current second are revoked by the key, those of
+    the current second can not be told apart from new ones by their `iat`, so
+    the token of the request revoking them is block-listed as well.
+
+    Args:
+        user_id (int): id of the user whose tokens are to be revoked
+        jti (str): jti of the JWT token of the current request
+        expires (int): exp of the JWT token of the current request
+    """
+    pipeline = jwt_redis_blocklist.pipeline(transaction=False)
+    pipeline.set(
+        name=f"revoked_before:{user_id}",
+        value=int(time()),
+        ex=current_app.config["JWT_ACCESS_TOKEN_EXPIRES"],
+    )
+    ttl = expires - int(time())
+    if ttl > 0:
+        pipeline.set(name=jti, value="", ex=ttl)
+    pipeline.execute()
@@ -46,6 +46,18 @@ url_detailed_response = api.inherit(
     },
 )
 
+url_bulk_update_response = api.model(
+    "URLBulkUpdateResponse", {"updated": fields.Integer}
+)
+
+url_search_response = api.model(
+    "URLSearchResponse",
+    {
+        "urls": fields.List(fields.Nested(url_detailed_response)),
+        "next_cursor": fields.String,
+    },
+)
+
 user_basic_response = api.model(
     "UserBasicResponse",
     {
@@ -57,6 +69,15 @@ user_basic_response = api.model(
     },
 )
 
+user_summary_response = api.model(
+    "UserSummaryResponse",
+    {
+        "url_count": fields.Integer,
+        "active_url_count": fields.Integer,
+        "total_visits": fields.Integer,
+    },
+)
+
 user_registered_response = api.inherit(
     "UserRegisteredResponse",
     user_basic_response,
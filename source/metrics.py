@@ -0,0 +1,71 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from collections import defaultdict
+from threading import Lock
+from typing import Callable, Dict
+
+
+class Metrics:
+    """In-process registry of counters and collector callbacks"""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._counters = defaultdict(int)
+        self._collectors = []
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increments the counter `name` by `value`
+
+        Args:
+            name (str): name of the counter
+            value (int, optional): amount to be added. Defaults to 1.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def register_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        """Registers the `collector` which will be called on every collection
+
+        Args:
+            collector (Callable[[], Dict[str, float]]): returns gauges as name: value
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> Dict[str, float]:
+        """Collects all counters and gauges from registered collectors
+
+        Returns:
+            Dict[str, float]: metric name mapped to its current value
+        """
+        with self._lock:
+            values = dict(self._counters)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                values.update(collector())
+            except Exception as err:
+                print(f"Metrics Collection Failed\nReason: {str(err)}")
+        return values
+
+
+metrics = Metrics()
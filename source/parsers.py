@@ -27,6 +27,9 @@ from source.validators import (
     password_validator,
     url_validator,
     bool_validator,
+    id_list_validator,
+    search_query_validator,
+    limit_validator,
 )
 
 
@@ -70,3 +73,22 @@ url_update_parser.add_argument(
     type=bool_validator,
     location="json",
 )
+
+url_bulk_update_parser = RequestParser(trim=True)
+url_bulk_update_parser.add_argument("ids", type=id_list_validator, location="json")
+url_bulk_update_parser.add_argument("target_prefix", type=str, location="json")
+url_bulk_update_parser.add_argument(
+    "active",
+    type=bool_validator,
+    required=True,
+    location="json",
+)
+
+url_search_parser = RequestParser(trim=True)
+url_search_parser.add_argument(
+    "q", dest="query", type=search_query_validator, required=True, location="args"
+)
+url_search_parser.add_argument(
+    "limit", type=limit_validator, default=20, location="args"
+)
+url_search_parser.add_argument("cursor", type=str, location="args")
@@ -0,0 +1,104 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from collections import Counter
+from typing import Callable
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from source.database import db
+from source.metrics import metrics
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in enforcing mode when an endpoint runs more queries than declared"""
+
+
+def query_budget(limit: int) -> Callable:
+    """Declares the max number of SQL statements a resource method may execute
+
+    Args:
+        limit (int): max number of statements per request
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.query_budget = limit
+        return func
+
+    return decorator
+
+
+class QueryRecorder:
+    """Counts SQL statements executed while serving each request
+
+    Statements executed more than once within a request are reported as
+    repeated, which usually points to N+1 lazy loads or duplicated checks.
+    Requests over the budget declared with `query_budget` are reported as
+    metrics, or fail when `QUERY_BUDGET_ENFORCE` is set (defaults to TESTING).
+    """
+
+    def init_app(self, app: Flask) -> None:
+        """Attaches the recorder to the engine and request lifecycle of `app`
+
+        Args:
+            app (Flask): application whose requests are to be recorded
+        """
+        event.listen(db.engine, "before_cursor_execute", self._record)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self) -> None:
+        g.sql_statements = Counter()
+
+    def _record(self, _conn, _cursor, statement, _params, _context, _many) -> None:
+        if has_request_context() and "sql_statements" in g:
+            g.sql_statements[statement] += 1
+
+    def _finish(self, response: Response) -> Response:
+        statements = g.pop("sql_statements", None)
+        if statements is None or request.endpoint is None:
+            return response
+        endpoint = request.endpoint
+        count = sum(statements.values())
+        repeated = {sql: n for sql, n in statements.items() if n > 1}
+        metrics.increment(f"sql_requests:{endpoint}")
+        metrics.increment(f"sql_queries:{endpoint}", count)
+        if repeated:
+            metrics.increment(f"sql_repeated_queries:{endpoint}", len(repeated))
+
+        budget = self._get_budget(endpoint)
+        if budget is not None and count > budget:
+            metrics.increment(f"sql_query_budget_exceeded:{endpoint}")
+            if current_app.config.get("QUERY_BUDGET_ENFORCE", current_app.testing):
+                raise QueryBudgetExceeded(
+                    f"{request.method} {endpoint} executed {count} queries, "
+                    f"budget is {budget}\nRepeated: {repeated}"
+                )
+        return response
+
+    def _get_budget(self, endpoint: str):
+        view_class = getattr(current_app.view_functions[endpoint], "view_class", None)
+        method = getattr(view_class, request.method.lower(), None)
+        return getattr(method, "query_budget", None)
+
+
+query_recorder = QueryRecorder()
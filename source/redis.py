@@ -25,3 +25,4 @@ from redis import StrictRedis
 
 
 jwt_redis_blocklist = StrictRedis.from_url(environ["REDIS_URI"])
+cache_redis = StrictRedis.from_url(environ.get("REDIS_CACHE_URI", environ["REDIS_URI"]))
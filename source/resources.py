@@ -19,21 +19,31 @@
  CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
  """
 
-from datetime import timedelta
 from time import time_ns
 
 from flask_restx import Resource, marshal
+from sqlalchemy import select
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from source.api import api, url_namespace, user_namespace
-from source.database import UserModel, URLModel
-from source.jwt import blocklist_token
+from source.bloom import slug_filter
+from source.concurrency import concurrency_class
+from source.database import db, UserModel, URLModel
+from source.hotlinks import hot_links
+from source.jobs import jobs
+from source.jwt import blocklist_token, revoke_user_tokens
+from source.metrics import metrics
+from source.queries import query_budget
+from source.search import url_search
+from source.tasks import record_visit, delete_user
 from source.parsers import (
     login_parser,
     register_parser,
     short_url_parser,
     url_update_parser,
+    url_bulk_update_parser,
+    url_search_parser,
     user_update_parser,
 )
 from source.marshallers import (
@@ -41,31 +51,51 @@ from source.marshallers import (
     user_basic_response,
     user_registered_response,
     user_detailed_response,
+    user_summary_response,
     url_basic_response,
     url_detailed_response,
+    url_bulk_update_response,
+    url_search_response,
 )
 
 
 @api.route("/", endpoint="index")
 class Index(Resource):
     @api.response(204, "No Content")
+    @query_budget(0)
     def get(self):
         """Endpoint for Liveness Probe"""
         return None, 204
 
 
+@api.route("/metrics", endpoint="metrics")
+class Metrics(Resource):
+    @api.response(200, "Success")
+    @query_budget(0)
+    def get(self):
+        """Endpoint for collecting application metrics"""
+        return metrics.collect(), 200
+
+
 @api.route("/go/<string:slug>", endpoint="go")
 class Go(Resource):
     @api.response(200, "Success", url_basic_response)
     @api.response(404, "Not Found")
+    @concurrency_class("redirect")
+    @query_budget(3)
     def get(self, slug: str):
         """Endpoint for getting target url from slug"""
         if slug and slug.isalnum():
-            url = URLModel.query.filter_by(slug=slug).one_or_none()
-            if url and url.active:
-                url.visit_count += 1
-                url.update_in_db()
-                return marshal(url, url_basic_response), 200
+            hot_link = hot_links.lookup(slug)
+            if hot_link:
+                jobs.enqueue(record_visit, url_id=hot_link.id, user_id=hot_link.user_id)
+                return marshal(hot_link._asdict(), url_basic_response), 200
+            if slug_filter.might_contain(slug):
+                url = URLModel.query.filter_by(slug=slug).one_or_none()
+                if url and url.active:
+                    response = marshal(url, url_basic_response)
+                    jobs.enqueue(record_visit, url_id=url.id, user_id=url.user_id)
+                    return response, 200
         return None, 404
 
 
@@ -74,6 +104,8 @@ class Login(Resource):
     @user_namespace.expect(login_parser)
     @user_namespace.response(200, "Success", login_response)
     @user_namespace.response(400, "Bad Request")
+    @concurrency_class("expensive")
+    @query_budget(1)
     def post(self):
         """Endpoint for User Login"""
         data = login_parser.parse_args(strict=True)
@@ -82,9 +114,7 @@ class Login(Resource):
             return (
                 marshal(
                     dict(
-                        access_token=create_access_token(
-                            identity=user, expires_delta=timedelta(minutes=30)
-                        ),
+                        access_token=create_access_token(identity=user),
                         usage="You will need to pass this in the Authorization header like Bearer access_token",
                     ),
                     login_response,
@@ -98,11 +128,12 @@ class Login(Resource):
 class Logout(Resource):
     @jwt_required(optional=True)
     @user_namespace.response(204, "No Content")
+    @query_budget(1)
     def get(self):
         """Endpoint for User Logout"""
         jwt = get_jwt()
         if jwt:
-            blocklist_token(jwt["jti"])
+            blocklist_token(jwt["jti"], jwt["exp"])
         return None, 204
 
 
@@ -112,6 +143,8 @@ class Register(Resource):
     @user_namespace.response(201, "Success", user_registered_response)
     @user_namespace.response(400, "Bad Request")
     @user_namespace.response(500, "Server Error")
+    @concurrency_class("expensive")
+    @query_budget(4)
     def post(self):
         """Endpoint for User Registration"""
         data = register_parser.parse_args(strict=True)
@@ -129,16 +162,21 @@ class User(Resource):
     @user_namespace.marshal_with(
         user_detailed_response, code=200, description="Success"
     )
+    @concurrency_class("expensive")
+    @query_budget(2)
     def get(self):
         """Endpoint for getting details about logged user"""
-        current_user.urls.all()
-        return current_user
+        # Marshalling the dynamic relationship would query once per URL
+        user = marshal(current_user, user_registered_response)
+        user["urls"] = current_user.urls.all()
+        return user
 
     @jwt_required()
     @user_namespace.expect(user_update_parser)
     @user_namespace.response(200, "Success", user_basic_response)
     @user_namespace.response(304, "Not Modified")
     @user_namespace.response(400, "Bad Request")
+    @query_budget(5)
     def patch(self):
         """Endpoint for updating details of logged user"""
         data = user_update_parser.parse_args()
@@ -154,35 +192,59 @@ class User(Resource):
             current_user.first_name = data.get("first_name") or current_user.first_name
             current_user.last_name = data.get("last_name") or current_user.last_name
             current_user.email = data.get("email") or current_user.email
-            current_user.password = data.get("password") or current_user.password
-            current_user.update_in_db()
+            if data.get("password"):
+                current_user.password = generate_password_hash(data["password"])
+            updated = current_user.update_in_db()
+            if updated and data.get("password"):
+                jwt = get_jwt()
+                revoke_user_tokens(current_user.id, jwt["jti"], jwt["exp"])
             return marshal(current_user, user_basic_response), 200
 
     @jwt_required()
     @user_namespace.response(200, "Success")
     @user_namespace.response(304, "Not Modified")
+    @query_budget(4)
     def delete(self):
         """Endpoint for deleting logged user"""
-        deleted = current_user.delete_from_db()
+        user_id = current_user.id
+        deleted = jobs.enqueue(delete_user, user_id=user_id)
         if deleted:
-            blocklist_token(get_jwt()["jti"])
+            jwt = get_jwt()
+            revoke_user_tokens(user_id, jwt["jti"], jwt["exp"])
         return None, 200 if deleted else 304
 
 
+@user_namespace.route("/summary", endpoint="user_summary")
+class UserSummary(Resource):
+    @jwt_required()
+    @user_namespace.marshal_with(user_summary_response, code=200, description="Success")
+    @query_budget(1)
+    def get(self):
+        """Endpoint for getting link and click counts of logged user"""
+        return current_user
+
+
 @url_namespace.route("/short", endpoint="short")
 class Short(Resource):
     @jwt_required()
     @url_namespace.expect(short_url_parser)
     @url_namespace.response(201, "Success", url_detailed_response)
     @url_namespace.response(500, "Server Error")
+    @query_budget(4)
     def post(self):
         """Endpoint for URL Shortening"""
         data = short_url_parser.parse_args(strict=True)
         url = URLModel(**data)
+        # Resolving the column default now as the counters depend on it
+        url.active = data["active"] if data["active"] is not None else True
         url.slug = self.__get_unique_slug()
         url.user_id = current_user.id
+        current_user.url_count = UserModel.url_count + 1
+        if url.active:
+            current_user.active_url_count = UserModel.active_url_count + 1
         saved = url.save_in_db()
         if saved:
+            slug_filter.add(url.slug)
             return marshal(url, url_detailed_response), 201
         return dict(message="Please try again after sometime"), 500
 
@@ -201,6 +263,7 @@ class URL(Resource):
     @jwt_required()
     @url_namespace.response(200, "Success", url_detailed_response)
     @url_namespace.response(404, "Not Found")
+    @query_budget(2)
     def get(self, url_id: int):
         """Endpoint for getting details about specific shortened URL"""
         url = self.__get_url_object(current_user.id, url_id)
@@ -214,6 +277,7 @@ class URL(Resource):
     @url_namespace.response(304, "Not Modified")
     @url_namespace.response(400, "Bad Request")
     @url_namespace.response(404, "Not Found")
+    @query_budget(7)
     def patch(self, url_id: int):
         """Endpoint for updating details about specific shortened URL"""
         data = url_update_parser.parse_args(strict=True)
@@ -221,6 +285,8 @@ class URL(Resource):
             return None, 304
         url = self.__get_url_object(current_user.id, url_id)
         if url:
+            was_active = bool(url.active)
+            old_slug = url.slug
             url.active = (
                 data["active"] if data.get("active") is not None else url.active
             )
@@ -230,22 +296,108 @@ class URL(Resource):
                     url.slug = data["slug"]
                 else:
                     return dict(message="slug already exists"), 400
-            url.update_in_db()
+            if bool(url.active) != was_active:
+                current_user.active_url_count = UserModel.active_url_count + (
+                    1 if url.active else -1
+                )
+            updated = url.update_in_db()
+            if updated:
+                slug_filter.add(url.slug)
+                if url.slug != old_slug:
+                    hot_links.invalidate((url.id, old_slug))
+                if url.active:
+                    hot_links.revalidate((url.id, url.slug))
+                else:
+                    hot_links.invalidate((url.id, url.slug))
             return marshal(url, url_detailed_response), 200
         return None, 404
 
     @jwt_required()
     @url_namespace.response(200, "Success")
     @url_namespace.response(304, "Not Modified")
+    @query_budget(4)
     def delete(self, url_id: int):
         """Endpoint for deactivating specific shortened URL"""
         url = self.__get_url_object(current_user.id, url_id)
         if url:
+            if url.active:
+                current_user.active_url_count = UserModel.active_url_count - 1
             url.active = False
+            link = (url.id, url.slug)
             updated = url.update_in_db()
+            if updated:
+                hot_links.invalidate(link)
         return None, 200 if updated else 304
 
     def __get_url_object(self, user_id: int, url_id: int):
         return URLModel.query.filter(
             URLModel.id == url_id, URLModel.user_id == user_id
         ).one_or_none()
+
+
+@url_namespace.route("/bulk", endpoint="url_bulk")
+class URLBulk(Resource):
+    @jwt_required()
+    @url_namespace.expect(url_bulk_update_parser)
+    @url_namespace.response(200, "Success", url_bulk_update_response)
+    @url_namespace.response(400, "Bad Request")
+    @url_namespace.response(500, "Server Error")
+    @concurrency_class("expensive")
+    @query_budget(4)
+    def patch(self):
+        """Endpoint for activating or deactivating many shortened URLs at once"""
+        data = url_bulk_update_parser.parse_args(strict=True)
+        if not data.get("ids") and not data.get("target_prefix"):
+            return dict(message="either ids or target_prefix is required"), 400
+        criteria = [
+            URLModel.user_id == current_user.id,
+            URLModel.active.is_not(data["active"]),
+        ]
+        if data.get("ids"):
+            criteria.append(URLModel.id.in_(data["ids"]))
+        if data.get("target_prefix"):
+            criteria.append(
+                URLModel.target.startswith(data["target_prefix"], autoescape=True)
+            )
+        links = []
+        if hot_links.enabled:
+            links = db.session.execute(
+                select(URLModel.id, URLModel.slug).where(*criteria)
+            ).all()
+        updated = URLModel.update_where(*criteria, active=data["active"])
+        if updated:
+            UserModel.increment_where(
+                UserModel.id == current_user.id,
+                active_url_count=updated if data["active"] else -updated,
+            )
+        # Committing both statements together keeps the counters consistent
+        if current_user.update_in_db():
+            if data["active"]:
+                hot_links.revalidate(*links)
+            else:
+                hot_links.invalidate(*links)
+            return marshal(dict(updated=updated), url_bulk_update_response), 200
+        return dict(message="Please try again after sometime"), 500
+
+
+@url_namespace.route("/search", endpoint="url_search")
+class Search(Resource):
+    @jwt_required()
+    @url_namespace.expect(url_search_parser)
+    @url_namespace.response(200, "Success", url_search_response)
+    @url_namespace.response(400, "Bad Request")
+    @concurrency_class("expensive")
+    @query_budget(2)
+    def get(self):
+        """Endpoint for searching shortened URLs of logged user by target"""
+        data = url_search_parser.parse_args(strict=True)
+        try:
+            urls, next_cursor = url_search.search(
+                current_user.id, data["query"], data["limit"], data.get("cursor")
+            )
+        except ValueError as err:
+            return dict(message=str(err)), 400
+        return (
+            marshal(dict(urls=urls, next_cursor=next_cursor), url_search_response),
+            200,
+        )
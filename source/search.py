@@ -0,0 +1,172 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import List, Tuple, Union
+
+from sqlalchemy import (
+    Float,
+    Integer,
+    and_,
+    cast,
+    column,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.exc import SQLAlchemyError
+
+from source.database import db, URLModel
+
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS urls_search USING fts5("
+    "target, content='urls', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS urls_search_insert AFTER INSERT ON urls BEGIN "
+    "INSERT INTO urls_search(rowid, target) VALUES (new.id, new.target); END",
+    "CREATE TRIGGER IF NOT EXISTS urls_search_delete AFTER DELETE ON urls BEGIN "
+    "INSERT INTO urls_search(urls_search, rowid, target) "
+    "VALUES ('delete', old.id, old.target); END",
+    "CREATE TRIGGER IF NOT EXISTS urls_search_update AFTER UPDATE OF target ON urls BEGIN "
+    "INSERT INTO urls_search(urls_search, rowid, target) "
+    "VALUES ('delete', old.id, old.target); "
+    "INSERT INTO urls_search(rowid, target) VALUES (new.id, new.target); END",
+)
+POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_urls_target_trgm ON urls USING gin (target gin_trgm_ops)",
+)
+
+
+class URLSearch:
+    """Substring search over targets of shortened URLs backed by an index
+
+    PostgreSQL uses a trigram GIN index on `urls.target`, SQLite uses an FTS5
+    trigram table kept in sync by triggers, anything else falls back to LIKE.
+    """
+
+    def __init__(self) -> None:
+        self.backend = "like"
+
+    def create_index(self) -> None:
+        """Creates the search index for the configured database if missing"""
+        dialect = db.engine.dialect.name
+        statements = dict(postgresql=POSTGRES_DDL, sqlite=SQLITE_DDL).get(dialect)
+        if not statements:
+            return
+        try:
+            with db.engine.begin() as connection:
+                new = (
+                    dialect == "sqlite"
+                    and not connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE name = 'urls_search'")
+                    ).first()
+                )
+                for statement in statements:
+                    connection.execute(text(statement))
+                if new:
+                    connection.execute(
+                        text("INSERT INTO urls_search(urls_search) VALUES ('rebuild')")
+                    )
+            self.backend = dialect
+        except SQLAlchemyError as err:
+            print(f"Search Index Creation Failed\nReason: {str(err)}")
+
+    def search(
+        self, user_id: int, query: str, limit: int, cursor: Union[str, None] = None
+    ) -> Tuple[List[URLModel], Union[str, None]]:
+        """Searches the URLs of the user whose target contains the `query`
+
+        Args:
+            user_id (int): id of the owner of URLs
+            query (str): text to be searched in targets
+            limit (int): max number of URLs to be returned
+            cursor (Union[str, None], optional): cursor of the previous page. Defaults to None.
+
+        Raises:
+            ValueError: if `cursor` is malformed
+
+        Returns:
+            Tuple[List[URLModel], Union[str, None]]: best matches first and the
+            cursor of next page, None if there are no more pages
+        """
+        if self.backend == "sqlite":
+            fts = table("urls_search", column("rowid", Integer))
+            # bm25 depends on corpus wide statistics which change with every
+            # insert, so ranking by match position and target length instead
+            # keeps the keyset cursor stable between pages
+            score = func.instr(
+                func.lower(URLModel.target), query.lower()
+            ) * 10**9 + func.length(URLModel.target)
+            phrase = '"' + query.replace('"', '""') + '"'
+            statement = (
+                select(URLModel, score)
+                .join(fts, fts.c.rowid == URLModel.id)
+                .where(literal_column("urls_search").op("MATCH")(phrase))
+            )
+        else:
+            pattern = "%{}%".format(
+                query.replace("/", "//").replace("%", "/%").replace("_", "/_")
+            )
+            if self.backend == "postgresql":
+                # word_similarity is a real, whose text form does not parse back
+                # to the same value, so the cursor compares doubles instead
+                score = cast(-func.word_similarity(query, URLModel.target), Float)
+            else:
+                score = literal(0.0)
+            statement = select(URLModel, score).where(
+                URLModel.target.ilike(pattern, escape="/")
+            )
+
+        statement = statement.where(URLModel.user_id == user_id)
+        if cursor:
+            last_score, last_id = self._decode_cursor(cursor)
+            statement = statement.where(
+                or_(
+                    score > last_score, and_(score == last_score, URLModel.id > last_id)
+                )
+            )
+        rows = db.session.execute(
+            statement.order_by(score, URLModel.id).limit(limit + 1)
+        ).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1][1], rows[-1][0].id)
+        return [url for url, _ in rows], next_cursor
+
+    def _encode_cursor(self, score: float, url_id: int) -> str:
+        return urlsafe_b64encode(f"{score!r}:{url_id}".encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> Tuple[float, int]:
+        try:
+            score, url_id = urlsafe_b64decode(cursor.encode()).decode().split(":")
+            return float(score), int(url_id)
+        except (ValueError, UnicodeDecodeError) as err:
+            raise ValueError("cursor is invalid.") from err
+
+
+url_search = URLSearch()
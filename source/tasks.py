@@ -0,0 +1,65 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from source.database import db, UserModel, URLModel
+from source.hotlinks import hot_links
+from source.jobs import jobs
+
+
+@jobs.task
+def record_visit(url_id: int, user_id: int) -> None:
+    """Counts a visit of the URL and its owner
+
+    Args:
+        url_id (int): id of the visited URL
+        user_id (int): id of the owner of URL
+    """
+    try:
+        URLModel.increment_where(URLModel.id == url_id, visit_count=1)
+        UserModel.increment_where(UserModel.id == user_id, total_visits=1)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+@jobs.task
+def delete_user(user_id: int) -> None:
+    """Deletes the user along with all of its URLs using set-based deletes
+
+    Args:
+        user_id (int): id of the user to be deleted
+    """
+    try:
+        if hot_links.enabled:
+            links = db.session.execute(
+                select(URLModel.id, URLModel.slug).where(URLModel.user_id == user_id)
+            ).all()
+            hot_links.invalidate(*links)
+        URLModel.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        UserModel.query.filter_by(id=user_id).delete(synchronize_session=False)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
@@ -146,3 +146,78 @@ def bool_validator(value: any) -> bool:
     """
 
     return value is not None and str(value).lower() in ("true", 1)
+
+
+def id_list_validator(ids: any) -> list:
+    """Validates the `ids` by checking it against established constraints
+
+    Args:
+        ids (any): list of ids from request payload
+
+    Raises:
+        ValueError: if not a list
+        ValueError: if more than 1000 ids
+        ValueError: if any of the ids is not a positive integer
+
+    Returns:
+        list: `ids` will be returned as it is after all checks
+    """
+
+    if not isinstance(ids, list):
+        raise ValueError("ids must be a list.")
+
+    # Every id is a bind parameter of a single IN clause
+    if len(ids) > 1000:
+        raise ValueError("ids can not be more than 1000.")
+
+    # Checking for integers, bool is a subclass of int
+    if not all(
+        isinstance(url_id, int) and not isinstance(url_id, bool) and url_id > 0
+        for url_id in ids
+    ):
+        raise ValueError("ids must be positive integers.")
+
+    return ids
+
+
+def search_query_validator(query: any) -> str:
+    """Validates the search `query` by checking it against established constraints
+
+    Args:
+        query (any): `q` from request query string
+
+    Raises:
+        ValueError: if length not between 3 and 100 characters
+
+    Returns:
+        str: `query` will be returned as it is after all checks
+    """
+
+    query = str(query)
+
+    # Trigram indexes can not serve shorter queries
+    if not 3 <= len(query) <= 100:
+        raise ValueError("q must be between 3 to 100 characters.")
+
+    return query
+
+
+def limit_validator(limit: any) -> int:
+    """Validates the page `limit` by checking it against established constraints
+
+    Args:
+        limit (any): `limit` from request query string
+
+    Raises:
+        ValueError: if not an integer between 1 and 100
+
+    Returns:
+        int: `limit` converted to integer after all checks
+    """
+
+    limit = int(limit)
+
+    if not 1 <= limit <= 100:
+        raise ValueError("limit must be between 1 to 100.")
+
+    return limit
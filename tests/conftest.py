@@ -0,0 +1,135 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from os import environ
+from tempfile import mkdtemp
+
+import fakeredis
+import pytest
+import redis
+
+# The app is configured while being imported, so the environment and the
+# Redis clients have to be in place before the first import of `run`
+environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{mkdtemp()}/test.sqlite"
+environ["REDIS_URI"] = "redis://localhost:6379/0"
+environ.pop("REDIS_CACHE_URI", None)
+environ.pop("JOBS_BACKEND", None)
+environ.pop("HOT_LINKS_SIZE", None)
+redis_server = fakeredis.FakeServer()
+redis.StrictRedis.from_url = classmethod(
+    lambda cls, url, **kwargs: fakeredis.FakeStrictRedis(server=redis_server)
+)
+
+from sqlalchemy import delete
+
+from run import app as flask_app
+from source.bloom import slug_filter
+from source.database import db, UserModel, URLModel
+from source.redis import cache_redis
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Enforces the query budgets of every request
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture(autouse=True)
+def clean_state(app):
+    cache_redis.flushall()
+    with app.app_context():
+        db.session.execute(delete(URLModel))
+        db.session.execute(delete(UserModel))
+        db.session.commit()
+        slug_filter.rebuild()
+    yield
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Returns a function logging a user in and returning the Authorization header"""
+
+    def login(username: str = "alice", password: str = "password1") -> dict:
+        response = client.post(
+            "/api/user/login", json=dict(username=username, password=password)
+        )
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def register(client, login):
+    """Returns a function registering a user and logging them in"""
+
+    def register(username: str = "alice", password: str = "password1") -> dict:
+        response = client.post(
+            "/api/user/register",
+            json=dict(
+                first_name="Alice",
+                last_name="Smith",
+                email=f"{username}@example.com",
+                username=username,
+                password=password,
+            ),
+        )
+        assert response.status_code == 201
+        return login(username, password)
+
+    return register
+
+
+@pytest.fixture
+def headers(register):
+    return register()
+
+
+@pytest.fixture
+def shorten(client):
+    """Returns a function shortening a URL and returning it"""
+
+    def shorten(headers: dict, url: str, active: str = "true") -> dict:
+        response = client.post(
+            "/api/url/short", json=dict(url=url, active=active), headers=headers
+        )
+        assert response.status_code == 201
+        return response.json
+
+    return shorten
+
+
+@pytest.fixture
+def summary(client):
+    """Returns a function fetching the counters of a user"""
+
+    def summary(headers: dict) -> dict:
+        response = client.get("/api/user/summary", headers=headers)
+        assert response.status_code == 200
+        return response.json
+
+    return summary
@@ -0,0 +1,84 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from random import Random
+
+from source.concurrency import Limiter, concurrency_limiter, default_limits
+
+
+def serve(limiter: Limiter, latency: float, endpoint: str) -> None:
+    assert limiter.acquire()
+    limiter.release(latency, endpoint)
+
+
+def test_bimodal_latency_keeps_limit_at_maximum():
+    random = Random(0)
+    limiter = Limiter("redirect", **default_limits(4)["redirect"])
+    for _ in range(20000):
+        # 1% of redirects exit early, e.g. slugs rejected by the slug filter
+        fast = random.random() < 0.01
+        serve(limiter, 0.0002 if fast else random.uniform(0.0016, 0.0024), "go")
+        assert int(limiter.limit) == limiter.maximum
+
+
+def test_mixed_endpoints_keep_limit_at_maximum():
+    random = Random(0)
+    limiter = Limiter("expensive", **default_limits(4)["expensive"])
+    latencies = dict(login=0.2, search=0.01, url_bulk=0.05)
+    for _ in range(20000):
+        endpoint = random.choice(list(latencies))
+        serve(limiter, latencies[endpoint] * random.uniform(0.5, 2), endpoint)
+        assert int(limiter.limit) == limiter.maximum
+
+
+def test_slowdown_shrinks_limit_until_recovered():
+    limiter = Limiter("test", initial=20, minimum=2, maximum=20, queue_size=2)
+    for _ in range(2000):
+        serve(limiter, 0.002, "go")
+    for _ in range(100):
+        serve(limiter, 0.016, "go")
+    assert limiter.limit < 15
+    for _ in range(3000):
+        serve(limiter, 0.002, "go")
+    assert limiter.limit == limiter.maximum
+
+
+def test_expensive_requests_leave_a_thread_free():
+    for threads in range(2, 33):
+        expensive = default_limits(threads)["expensive"]
+        assert expensive["maximum"] + expensive["queue_size"] <= threads - 1
+
+
+def test_requests_over_the_limit_are_shed(client, monkeypatch):
+    limiter = concurrency_limiter.limiters["expensive"]
+    monkeypatch.setattr(limiter, "limit", 1.0)
+    monkeypatch.setattr(limiter, "queue_timeout", 0.01)
+    assert limiter.acquire()
+    try:
+        response = client.post(
+            "/api/user/login", json=dict(username="alice", password="password1")
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        # Other classes are still served
+        assert client.get("/api/go/unknown").status_code == 404
+    finally:
+        limiter.release(0.001)
@@ -0,0 +1,90 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+import pytest
+
+from source.hotlinks import hot_links
+from source.metrics import metrics
+from source.redis import cache_redis
+
+
+@pytest.fixture
+def warm_up(app, monkeypatch):
+    """Returns a function loading the hot links table of `size` slugs"""
+    monkeypatch.setattr(hot_links, "enabled", True)
+    monkeypatch.setattr(hot_links, "links", hot_links.links)
+
+    def warm_up(size: int) -> None:
+        with app.app_context():
+            hot_links.load(size)
+
+    return warm_up
+
+
+def test_hot_link_served_from_memory(client, headers, shorten, summary, warm_up):
+    url = shorten(headers, "https://www.example.com/a")
+    warm_up(1)
+    hits = metrics.collect().get("hot_links_hits", 0)
+    assert client.get(f"/api/go/{url['slug']}").status_code == 200
+    assert metrics.collect()["hot_links_hits"] == hits + 1
+    assert summary(headers)["total_visits"] == 1
+
+
+def test_only_warmed_links_are_marked_stale(client, headers, shorten, warm_up):
+    hot = shorten(headers, "https://www.example.com/hot")
+    cold = shorten(headers, "https://www.example.com/cold")
+    client.get(f"/api/go/{hot['slug']}")
+    warm_up(1)
+    response = client.patch(
+        "/api/url/bulk",
+        json=dict(target_prefix="https://www.example.com/", active="false"),
+        headers=headers,
+    )
+    assert response.json == dict(updated=2)
+    assert cache_redis.smembers(hot_links.stale_key) == {
+        f"{hot['slug']}:{hot['id']}".encode()
+    }
+    assert client.get(f"/api/go/{hot['slug']}").status_code == 404
+    assert client.get(f"/api/go/{cold['slug']}").status_code == 404
+
+    client.patch(
+        "/api/url/bulk", json=dict(ids=[hot["id"]], active="true"), headers=headers
+    )
+    assert cache_redis.smembers(hot_links.stale_key) == set()
+    assert client.get(f"/api/go/{hot['slug']}").status_code == 200
+
+
+def test_renamed_hot_link_is_not_served(client, headers, shorten, warm_up):
+    url = shorten(headers, "https://www.example.com/a")
+    warm_up(1)
+    client.patch(f"/api/url/{url['id']}", json=dict(slug="renamed"), headers=headers)
+    assert client.get(f"/api/go/{url['slug']}").status_code == 404
+    assert client.get("/api/go/renamed").status_code == 200
+
+
+def test_deleted_user_links_are_not_served(client, register, shorten, warm_up):
+    alice = register("alice")
+    url = shorten(alice, "https://www.example.com/a")
+    shorten(alice, "https://www.example.com/b")
+    warm_up(1)
+    assert client.delete("/api/user/", headers=alice).status_code == 200
+    assert cache_redis.scard(hot_links.stale_key) == 1
+    assert client.get(f"/api/go/{url['slug']}").status_code == 404
@@ -0,0 +1,101 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from source.jobs import JobQueue, MemoryBackend, RedisBackend
+from source.redis import cache_redis
+
+
+@pytest.fixture(params=["memory", "redis"])
+def queue(app, request):
+    queue = JobQueue()
+    queue.app = app
+    queue.retry_backoff = 0
+    queue.backend = MemoryBackend() if request.param == "memory" else RedisBackend()
+    return queue
+
+
+def test_failing_job_is_retried_then_buried(queue):
+    calls = []
+
+    @queue.task
+    def flaky(fail_times: int) -> None:
+        calls.append(fail_times)
+        if len(calls) <= fail_times:
+            raise ValueError("flaky")
+
+    queue.enqueue(flaky, fail_times=2)
+    queue.work(burst=True)
+    assert len(calls) == 3
+    stats = queue.backend.stats()
+    assert (stats["retried"], stats["succeeded"]) == (2, 1)
+
+    calls.clear()
+    queue.enqueue(flaky, fail_times=99)
+    queue.work(burst=True)
+    assert len(calls) == queue.max_retries + 1
+    assert queue.backend.stats()["dead_depth"] == 1
+
+
+def test_worker_survives_redis_errors(app, monkeypatch):
+    queue = JobQueue()
+    queue.app = app
+    queue.backend = RedisBackend()
+    calls = []
+
+    @queue.task
+    def record() -> None:
+        calls.append(1)
+
+    queue.enqueue(record)
+
+    pop, increment = queue.backend.pop, queue.backend.increment
+    # Losing the connection once while popping and once while counting
+    failures = {"pop": 1, "increment": 1}
+
+    def failing(name, func):
+        def call(*args, **kwargs):
+            if failures[name]:
+                failures[name] -= 1
+                raise ConnectionError("blip")
+            return func(*args, **kwargs)
+
+        return call
+
+    monkeypatch.setattr(queue.backend, "pop", failing("pop", pop))
+    monkeypatch.setattr(queue.backend, "increment", failing("increment", increment))
+    queue.work(burst=True)
+    assert calls == [1]
+    assert cache_redis.llen(queue.backend.processing_key) == 0
+
+
+def test_jobs_of_stopped_worker_are_recovered(app):
+    crashed = RedisBackend()
+    crashed.push("payload")
+    assert crashed.pop(timeout=1) == b"payload"
+    # No heartbeat was ever written for the crashed worker
+    worker = RedisBackend()
+    worker.heartbeat(30)
+    assert worker.recover() == 1
+    assert cache_redis.lrange(worker.queue_key, 0, -1) == [b"payload"]
+    assert cache_redis.llen(crashed.processing_key) == 0
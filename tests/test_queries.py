@@ -0,0 +1,53 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+import pytest
+
+from source.queries import QueryBudgetExceeded
+from source.resources import Short
+
+
+def test_index_and_metrics_run_no_queries(client):
+    assert client.get("/api/").status_code == 204
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert "sql_requests:index" in response.json
+
+
+def test_budget_is_enforced_when_testing(client, headers, monkeypatch):
+    monkeypatch.setattr(Short.post, "query_budget", 1)
+    with pytest.raises(QueryBudgetExceeded):
+        client.post(
+            "/api/url/short",
+            json=dict(url="https://www.example.com/a"),
+            headers=headers,
+        )
+
+
+def test_budget_is_reported_when_not_enforced(app, client, headers, monkeypatch):
+    monkeypatch.setattr(Short.post, "query_budget", 1)
+    monkeypatch.setitem(app.config, "QUERY_BUDGET_ENFORCE", False)
+    response = client.post(
+        "/api/url/short", json=dict(url="https://www.example.com/a"), headers=headers
+    )
+    assert response.status_code == 201
+    metrics = client.get("/api/metrics").json
+    assert metrics["sql_query_budget_exceeded:short"] >= 1
@@ -0,0 +1,165 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+def test_short_and_go_update_counters(client, headers, shorten, summary):
+    url = shorten(headers, "https://www.example.com/a")
+    shorten(headers, "https://www.example.com/b", active="false")
+    for _ in range(3):
+        response = client.get(f"/api/go/{url['slug']}")
+        assert response.status_code == 200
+        assert response.json["target"] == "https://www.example.com/a"
+    assert summary(headers) == dict(url_count=2, active_url_count=1, total_visits=3)
+    assert client.get(f"/api/url/{url['id']}", headers=headers).json["visit_count"] == 3
+
+
+def test_short_defaults_to_active(client, headers, summary):
+    response = client.post(
+        "/api/url/short", json=dict(url="https://www.example.com/a"), headers=headers
+    )
+    assert response.status_code == 201
+    assert response.json["active"] is True
+    assert summary(headers)["active_url_count"] == 1
+
+
+def test_go_unknown_or_inactive_slug(client, headers, shorten):
+    url = shorten(headers, "https://www.example.com/a", active="false")
+    assert client.get("/api/go/unknown").status_code == 404
+    assert client.get(f"/api/go/{url['slug']}").status_code == 404
+
+
+def test_url_of_other_user_is_not_found(client, register, shorten):
+    url = shorten(register("alice"), "https://www.example.com/a")
+    response = client.get(f"/api/url/{url['id']}", headers=register("bob"))
+    assert response.status_code == 404
+
+
+def test_update_url(client, headers, shorten, summary):
+    url = shorten(headers, "https://www.example.com/a")
+    other = shorten(headers, "https://www.example.com/b")
+    response = client.patch(
+        f"/api/url/{url['id']}",
+        json=dict(slug="renamed", active="false"),
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json["slug"] == "renamed"
+    assert summary(headers)["active_url_count"] == 1
+    assert client.get("/api/go/renamed").status_code == 404
+    response = client.patch(
+        f"/api/url/{other['id']}", json=dict(slug="renamed"), headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_renamed_slug_redirects(client, headers, shorten):
+    url = shorten(headers, "https://www.example.com/a")
+    client.patch(f"/api/url/{url['id']}", json=dict(slug="renamed"), headers=headers)
+    assert client.get("/api/go/renamed").status_code == 200
+    assert client.get(f"/api/go/{url['slug']}").status_code == 404
+
+
+def test_delete_url_deactivates_it(client, headers, shorten, summary):
+    url = shorten(headers, "https://www.example.com/a")
+    assert client.delete(f"/api/url/{url['id']}", headers=headers).status_code == 200
+    assert summary(headers) == dict(url_count=1, active_url_count=0, total_visits=0)
+    assert client.get(f"/api/go/{url['slug']}").status_code == 404
+
+
+def test_bulk_update_by_ids(client, headers, shorten, summary):
+    urls = [shorten(headers, f"https://www.example.com/{i}") for i in range(3)]
+    response = client.patch(
+        "/api/url/bulk",
+        json=dict(ids=[urls[0]["id"], urls[1]["id"]], active="false"),
+        headers=headers,
+    )
+    assert response.json == dict(updated=2)
+    assert summary(headers)["active_url_count"] == 1
+    # Already inactive URLs are not counted again
+    response = client.patch(
+        "/api/url/bulk", json=dict(ids=[urls[0]["id"]], active="false"), headers=headers
+    )
+    assert response.json == dict(updated=0)
+    assert summary(headers)["active_url_count"] == 1
+
+
+def test_bulk_update_by_target_prefix(client, headers, shorten, summary):
+    for i in range(3):
+        shorten(headers, f"https://www.example.com/docs/{i}", active="false")
+    shorten(headers, "https://www.example.com/blog/0", active="false")
+    response = client.patch(
+        "/api/url/bulk",
+        json=dict(target_prefix="https://www.example.com/docs/", active="true"),
+        headers=headers,
+    )
+    assert response.json == dict(updated=3)
+    assert summary(headers)["active_url_count"] == 3
+
+
+def test_bulk_update_only_touches_own_urls(client, register, shorten, summary):
+    alice, bob = register("alice"), register("bob")
+    url = shorten(bob, "https://www.example.com/a")
+    response = client.patch(
+        "/api/url/bulk", json=dict(ids=[url["id"]], active="false"), headers=alice
+    )
+    assert response.json == dict(updated=0)
+    assert summary(bob)["active_url_count"] == 1
+
+
+def test_bulk_update_validation(client, headers):
+    for payload in (
+        dict(active="false"),
+        dict(ids=[True], active="false"),
+        dict(ids=[0], active="false"),
+        dict(ids=list(range(1, 1002)), active="false"),
+    ):
+        response = client.patch("/api/url/bulk", json=payload, headers=headers)
+        assert response.status_code == 400
+
+
+def test_search_pages_without_duplicates(client, headers, shorten):
+    created = {
+        shorten(headers, f"https://www.example.com/docs?page={i}")["id"]
+        for i in range(7)
+    }
+    shorten(headers, "https://www.example.com/blog")
+    found, cursor = [], None
+    while True:
+        params = dict(q="docs", limit=3)
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/url/search", query_string=params, headers=headers)
+        assert response.status_code == 200
+        found += [url["id"] for url in response.json["urls"]]
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            break
+        # Inserts between pages must not shift the remaining ones
+        shorten(headers, "https://www.example.com/docs")
+    assert len(found) == len(set(found))
+    assert created <= set(found)
+
+
+def test_search_validation(client, headers):
+    response = client.get("/api/url/search?q=ab", headers=headers)
+    assert response.status_code == 400
+    response = client.get("/api/url/search?q=abc&cursor=broken", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+"""
+ Copyright (c) 2023 Vishv Patel (https://github.com/itsthevp)
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+from time import sleep
+
+
+def test_register_rejects_taken_username(client, register):
+    register()
+    response = client.post(
+        "/api/user/register",
+        json=dict(
+            first_name="Alice",
+            last_name="Smith",
+            email="other@example.com",
+            username="alice",
+            password="password1",
+        ),
+    )
+    assert response.status_code == 400
+
+
+def test_login_rejects_invalid_credentials(client, register):
+    register()
+    response = client.post(
+        "/api/user/login", json=dict(username="alice", password="wrong-password")
+    )
+    assert response.status_code == 400
+
+
+def test_user_details(client, headers, shorten):
+    shorten(headers, "https://www.example.com/a")
+    response = client.get("/api/user/", headers=headers)
+    assert response.status_code == 200
+    assert response.json["username"] == "alice"
+    assert len(response.json["urls"]) == 1
+
+
+def test_update_user(client, headers):
+    response = client.patch("/api/user/", json=dict(first_name="Bob"), headers=headers)
+    assert response.status_code == 200
+    assert response.json["first_name"] == "Bob"
+    assert client.patch("/api/user/", json=dict(), headers=headers).status_code == 304
+
+
+def test_logout_revokes_token(client, headers):
+    assert client.get("/api/user/logout", headers=headers).status_code == 204
+    assert client.get("/api/user/summary", headers=headers).status_code == 401
+
+
+def test_password_change_revokes_issued_tokens(client, register, login):
+    older = register()
+    # `iat` is in whole seconds, so the older token needs an earlier second
+    sleep(1.1)
+    current = login()
+    response = client.patch(
+        "/api/user/", json=dict(password="password2"), headers=current
+    )
+    assert response.status_code == 200
+    assert client.get("/api/user/summary", headers=older).status_code == 401
+    assert client.get("/api/user/summary", headers=current).status_code == 401
+    # A login right after the revocation gets a working token
+    fresh = login(password="password2")
+    assert client.get("/api/user/summary", headers=fresh).status_code == 200
+
+
+def test_delete_user(client, headers, shorten):
+    shorten(headers, "https://www.example.com/a")
+    assert client.delete("/api/user/", headers=headers).status_code == 200
+    assert client.get("/api/user/summary", headers=headers).status_code == 401
+    response = client.post(
+        "/api/user/login", json=dict(username="alice", password="password1")
+    )
+    assert response.status_code == 400